@@ -1 +1,2 @@
 from orvibo.orvibo import *
+from orvibo.fleet import *
@@ -0,0 +1,334 @@
+#!/usr/bin/python3
+
+# @file analysis.py
+# Analysis of IR signals learned with Orvibo AllOne: decoding, fingerprints
+# and lookup of similar signals. Requires numpy.
+
+import fnmatch
+import os
+
+import numpy as np
+
+from orvibo.orvibo import OrviboException
+
+# Number of pulse/space durations kept in the fingerprint
+FINGERPRINT_SIZE = 128
+
+# Fingerprint resolution: number of duration buckets per doubling of duration
+BUCKETS_PER_OCTAVE = 8
+
+# Shortest duration in microseconds, that goes to the first bucket
+MIN_DURATION = 16
+
+# Max difference in buckets between durations of two captures of the same button
+JITTER_BUCKETS = 2
+
+# Number of fingerprints compared with the whole library at once while searching duplicates
+BLOCK_SIZE = 512
+
+# Type of file names: str for python3, unicode for python2 where str is raw bytes
+_FILE_NAME_TYPE = type(b''.decode('ascii'))
+
+def _read_signal(signal):
+    """ Reads signal from file if file name is given.
+    """
+    if isinstance(signal, _FILE_NAME_TYPE):
+        with open(signal, 'rb') as f:
+            return f.read()
+    return signal
+
+def timings(signal):
+    """ Decodes AllOne IR payload into durations.
+
+    Payload starts with 2 bytes little endian length of the rest data,
+    followed by 16 bit little endian durations in microseconds, pulses and spaces alternately.
+
+    Arguments:
+    signal -- raw signal got with Orvibo.learn method or file name with signal
+              (unicode string for python2)
+
+    returns -- numpy array of durations in microseconds, starting with pulse
+    """
+    data = bytes(_read_signal(signal))
+    if len(data) >= 2 and int(np.frombuffer(data[:2], dtype='<u2')[0]) == len(data) - 2:
+        data = data[2:]
+
+    durations = np.frombuffer(data[:len(data) // 2 * 2], dtype='<u2').astype(np.int32)
+    return np.trim_zeros(durations, 'b')
+
+def decode(signal):
+    """ Decodes AllOne IR payload into pulse and space timings.
+
+    Arguments:
+    signal -- raw signal got with Orvibo.learn method or file name with signal
+
+    returns -- tuple (pulses, spaces) of numpy arrays with durations in microseconds
+    """
+    durations = timings(signal)
+    return durations[0::2], durations[1::2]
+
+def _buckets(durations):
+    """ Quantizes durations to logarithmic buckets.
+    """
+    buckets = np.rint(np.log2(np.maximum(durations, 1) / float(MIN_DURATION)) * BUCKETS_PER_OCTAVE) + 1
+    return np.clip(buckets, 1, 255).astype(np.uint8)
+
+def _fold(buckets):
+    """ Fingerprint of the whole frame: all buckets of the short frame,
+        beginning and end of the frame longer than FINGERPRINT_SIZE.
+    """
+    result = np.zeros(FINGERPRINT_SIZE, dtype=np.uint8)
+    if len(buckets) <= FINGERPRINT_SIZE:
+        result[:len(buckets)] = buckets
+    else:
+        half = FINGERPRINT_SIZE // 2
+        result[:half] = buckets[:half]
+        result[half:] = buckets[-half:]
+    return result
+
+def fingerprint(signal):
+    """ Builds compact fingerprint of IR signal.
+
+    Each duration is quantized to logarithmic bucket, so timing jitter
+    of the captures changes fingerprint by JITTER_BUCKETS at most. 0 means no duration.
+    Signals longer than FINGERPRINT_SIZE durations are represented by their beginning and end,
+    e.g. air conditioner frames with temperature near the end.
+
+    Arguments:
+    signal -- raw signal got with Orvibo.learn method or file name with signal
+
+    returns -- numpy uint8 array of FINGERPRINT_SIZE length
+    """
+    return _fold(_buckets(timings(signal)))
+
+def _same(a, b, jitter):
+    """ True for rows where every duration of fingerprints a and b differs within jitter.
+    """
+    return np.abs(a.astype(np.int16) - b.astype(np.int16)).max(axis=-1) <= jitter
+
+def _same_buckets(a, b, jitter):
+    """ True if whole signals a and b given as buckets have the same number of durations
+        and every duration differs within jitter.
+    """
+    if len(a) != len(b):
+        return False
+    return not len(a) or int(np.abs(a.astype(np.int16) - b.astype(np.int16)).max()) <= jitter
+
+def _full_distance(a, b):
+    """ Squared euclidean distance between whole signals given as buckets, missing durations are zeros.
+    """
+    x = np.zeros(max(len(a), len(b)), dtype=np.int32)
+    y = np.zeros(len(x), dtype=np.int32)
+    x[:len(a)] = a
+    y[:len(b)] = b
+    return int(((x - y) ** 2).sum())
+
+def _bound(jitter):
+    """ Max squared distance between fingerprints of the same signal.
+    """
+    return FINGERPRINT_SIZE * jitter ** 2
+
+class SignalLibrary(object):
+    """ Collection of IR signal fingerprints for fast lookup of similar signals.
+
+    Fingerprints are used to find candidates, which are checked against whole signals.
+    """
+
+    def __init__(self):
+        self.names = []
+        self.__fingerprints = np.zeros((16, FINGERPRINT_SIZE), dtype=np.uint8)
+        # Fingerprints as float32 and their squared norms for distance computation
+        self.__points = np.zeros((16, FINGERPRINT_SIZE), dtype=np.float32)
+        self.__norms = np.zeros(16, dtype=np.float32)
+        # Buckets of all durations of all signals one after another and end of every signal
+        self.__buckets = bytearray()
+        self.__ends = np.zeros(16, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __repr__(self):
+        return 'SignalLibrary[{} signals]'.format(len(self))
+
+    @staticmethod
+    def from_directory(path, pattern = '*.ir'):
+        """ Creates library of all signal files in the directory.
+
+        Arguments:
+        path -- directory with signal files
+        pattern -- file name pattern of signal files
+
+        returns -- SignalLibrary with file names as signal names
+        """
+        library = SignalLibrary()
+        for fname in sorted(fnmatch.filter(os.listdir(path), pattern)):
+            with open(os.path.join(path, fname), 'rb') as f:
+                library.add(fname, f.read())
+        return library
+
+    @property
+    def fingerprints(self):
+        """ numpy array of fingerprints, one row per signal
+        """
+        return self.__fingerprints[:len(self)]
+
+    def __raw_buckets(self, indx):
+        start = int(self.__ends[indx - 1]) if indx else 0
+        return bytes(self.__buckets[start:int(self.__ends[indx])])
+
+    def __signal_buckets(self, indx):
+        return np.frombuffer(self.__raw_buckets(indx), dtype=np.uint8)
+
+    def add(self, name, signal):
+        """ Adds signal to the library.
+
+        Arguments:
+        name -- name of the signal, e.g. button or file name
+        signal -- raw signal or file name with signal
+
+        returns -- index of the signal in the library
+        """
+        indx = len(self)
+        if indx == len(self.__fingerprints):
+            self.__fingerprints = np.resize(self.__fingerprints, (indx * 2, FINGERPRINT_SIZE))
+            self.__points = np.resize(self.__points, (indx * 2, FINGERPRINT_SIZE))
+            self.__norms = np.resize(self.__norms, indx * 2)
+            self.__ends = np.resize(self.__ends, indx * 2)
+
+        buckets = _buckets(timings(signal))
+        fp = _fold(buckets)
+        self.__fingerprints[indx] = fp
+        self.__points[indx] = fp
+        self.__norms[indx] = self.__points[indx].dot(self.__points[indx])
+        self.__buckets.extend(buckets.tobytes())
+        self.__ends[indx] = len(self.__buckets)
+        self.names.append(name)
+        return indx
+
+    def __distances(self, fp):
+        fp = fp.astype(np.float32)
+        count = len(self)
+        # |a - b|^2 = |a|^2 + |b|^2 - 2ab is exact, since all values are small integers
+        return self.__norms[:count] + fp.dot(fp) - 2 * self.__points[:count].dot(fp)
+
+    def distances(self, signal):
+        """ Squared euclidean distances between fingerprint of the signal and every fingerprint in the library.
+
+        returns -- numpy array of distances in order of library signals
+        """
+        return self.__distances(fingerprint(signal))
+
+    def match(self, signal, k = 1, jitter = JITTER_BUCKETS):
+        """ Finds library signals closest to the given one.
+
+        Arguments:
+        signal -- raw signal got with Orvibo.learn method or file name with signal
+        k -- max number of signals to return
+        jitter -- max difference in buckets of every duration of matched signals,
+                  None for k signals with the closest fingerprints
+
+        returns -- list of (name, distance) sorted by squared euclidean distance between whole signals
+        raises -- OrviboException if k is less than 1
+        """
+        if k < 1:
+            raise OrviboException('Number of signals to match must be positive, got {}.'.format(k))
+
+        buckets = _buckets(timings(signal))
+        fp = _fold(buckets)
+        distances = self.__distances(fp)
+        if jitter is not None:
+            candidates = np.flatnonzero(distances <= _bound(jitter))
+            candidates = candidates[_same(self.fingerprints[candidates], fp, jitter)]
+            # Fingerprint skips middle of long signals, so candidates are checked against whole signals
+            candidates = [i for i in candidates if _same_buckets(self.__signal_buckets(i), buckets, jitter)]
+        elif len(distances):
+            count = min(k, len(distances))
+            candidates = np.argpartition(distances, count - 1)[:count]
+        else:
+            candidates = []
+
+        matches = [(_full_distance(self.__signal_buckets(i), buckets), i) for i in candidates]
+        matches.sort()
+        return [(self.names[i], distance) for distance, i in matches[:k]]
+
+    def __duplicate_groups(self, jitter):
+        """ Indexes of signals which are the same within jitter, grouped.
+            The first index of every group is the first added signal, all others are within jitter from it.
+        """
+        count = len(self)
+        if not count:
+            return []
+
+        # Signals with exactly the same buckets are grouped at once,
+        # the other ones are compared by the first added signal of every kind
+        kinds = {}
+        kind_of = np.empty(count, dtype=np.intp)
+        firsts = []
+        for indx in range(count):
+            kind = kinds.setdefault(self.__raw_buckets(indx), len(firsts))
+            if kind == len(firsts):
+                firsts.append(indx)
+            kind_of[indx] = kind
+        firsts = np.array(firsts)
+        kinds_count = len(firsts)
+
+        # Candidate pairs are close in euclidean distance, computed block by block via matrix product
+        fingerprints = self.__fingerprints[firsts]
+        points = self.__points[firsts]
+        norms = self.__norms[firsts]
+        first, second = [], []
+        for start in range(0, kinds_count, BLOCK_SIZE):
+            block = slice(start, start + BLOCK_SIZE)
+            distances = norms[block, None] + norms[None, start:] - 2 * points[block].dot(points[start:].T)
+            i, j = np.nonzero(distances <= _bound(jitter))
+            later = j > i
+            i, j = i[later] + start, j[later] + start
+            for chunk in range(0, len(i), BLOCK_SIZE * FINGERPRINT_SIZE):
+                pairs = slice(chunk, chunk + BLOCK_SIZE * FINGERPRINT_SIZE)
+                same = _same(fingerprints[i[pairs]], fingerprints[j[pairs]], jitter)
+                first.append(i[pairs][same])
+                second.append(j[pairs][same])
+        first = np.concatenate(first) if first else np.zeros(0, dtype=int)
+        second = np.concatenate(second) if second else np.zeros(0, dtype=int)
+
+        # Kinds are numbered in order of adding, so every kind joins the group of the first added
+        # similar kind, which is not in a group yet, and whole signals are the same within jitter
+        owner = np.arange(kinds_count)
+        for i, j in zip(first.tolist(), second.tolist()):
+            if owner[i] == i and owner[j] == j and \
+               _same_buckets(self.__signal_buckets(firsts[i]), self.__signal_buckets(firsts[j]), jitter):
+                owner[j] = i
+
+        group_of = owner[kind_of]
+        order = np.argsort(group_of, kind='stable')
+        bounds = np.flatnonzero(np.diff(group_of[order])) + 1
+        return [g for g in np.split(order, bounds) if len(g) > 1]
+
+    def duplicates(self, jitter = JITTER_BUCKETS):
+        """ Groups signals which are the same within jitter.
+
+        returns -- list of lists with names of duplicated signals in order of adding,
+                   every signal is within jitter from the first one of its group
+        """
+        return [[self.names[i] for i in group] for group in self.__duplicate_groups(jitter)]
+
+    def dedupe(self, jitter = JITTER_BUCKETS):
+        """ Removes duplicated signals from the library, keeps first added signal of each group.
+
+        returns -- list of names of removed signals
+        """
+        count = len(self)
+        keep = np.ones(count, dtype=bool)
+        for group in self.__duplicate_groups(jitter):
+            keep[group[1:]] = False
+
+        removed = [name for name, k in zip(self.names, keep) if not k]
+        if removed:
+            lengths = np.diff(np.concatenate(([0], self.__ends[:count])))
+            self.__buckets = bytearray(b''.join(self.__raw_buckets(i) for i in np.flatnonzero(keep)))
+            self.__ends = np.cumsum(lengths[keep])
+            self.__fingerprints = self.fingerprints[keep]
+            self.__points = self.__points[:count][keep]
+            self.__norms = self.__norms[:count][keep]
+            self.names = [name for name, k in zip(self.names, keep) if k]
+        return removed
@@ -0,0 +1,263 @@
+#!/usr/bin/python3
+
+# @file fleet.py
+# Compact storage for large number of known Orvibo devices.
+
+from array import array
+import bisect
+import binascii
+import socket
+import struct
+
+from orvibo.orvibo import Orvibo, OrviboException, BROADCAST, py3, _mac_bytes, _device_logger
+
+__all__ = ['Fleet', 'OrviboHandle']
+
+# 4 bytes unsigned array type to keep IPv4 addresses and lower part of MAC
+_U32_TYPECODE = 'I' if array('I').itemsize >= 4 else 'L'
+
+_TYPES = ('Unknown', Orvibo.TYPE_SOCKET, Orvibo.TYPE_IRDA)
+
+def _type_code(type):
+    """ Index of the type in _TYPES, None means unknown type.
+
+    raises -- OrviboException for unsupported type
+    """
+    if type is None:
+        return 0
+    if type not in _TYPES:
+        raise OrviboException('Unsupported device type: {}'.format(type))
+    return _TYPES.index(type)
+
+def _mac_key(mac):
+    """ MAC address as (upper 2 bytes, lower 4 bytes) integers pair.
+    """
+    return struct.unpack('>HI', _mac_bytes(mac))
+
+def _key_to_mac(hi, lo):
+    return struct.pack('>HI', hi, lo)
+
+def _ip_to_int(ip):
+    try:
+        return struct.unpack('!I', socket.inet_aton(ip))[0]
+    except (socket.error, TypeError, ValueError):
+        raise OrviboException('Invalid ip address: {}'.format(ip))
+
+def _int_to_ip(n):
+    return socket.inet_ntoa(struct.pack('!I', n))
+
+_UNKNOWN_IP = _ip_to_int(BROADCAST)
+
+def _bisect(key, count, value):
+    """ Leftmost position to insert value into table of count rows sorted by key(row).
+    """
+    lo, hi = 0, count
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if key(mid) < value:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+class OrviboHandle(object):
+    """ Lightweight description of known Orvibo device.
+
+    Keeps only ip, binary mac and type, use device() to talk with the device.
+    """
+    __slots__ = ('ip', 'mac', 'type')
+
+    def __init__(self, ip, mac, type = 'Unknown'):
+        self.ip = ip
+        self.mac = _mac_bytes(mac)
+        self.type = type
+
+    def __repr__(self):
+        mac = binascii.hexlify(bytearray(self.mac))
+        return "OrviboHandle[type={}, ip={}, mac={}]".format(self.type, 'Unknown' if self.ip == BROADCAST else self.ip, mac.decode('utf-8') if py3 else mac)
+
+    def __eq__(self, other):
+        return isinstance(other, OrviboHandle) and (self.ip, self.mac, self.type) == (other.ip, other.mac, other.type)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.mac)
+
+    @property
+    def logger(self):
+        """ Shared module logger adapted for this device.
+        """
+        return _device_logger(self.ip)
+
+    def device(self):
+        """ Creates Orvibo object to control the device.
+            AllOne awake state is kept per MAC, so new objects don't wake it up again.
+        """
+        return Orvibo(self.ip, self.mac, self.type)
+
+class Fleet(object):
+    """ Table of known Orvibo devices.
+
+    Devices are stored in plain arrays sorted by MAC address with separate
+    index sorted by ip, so tracking thousands of devices costs several bytes per device.
+
+    IP address belongs to single device in the fleet. When device is added with ip
+    that is held by another device, the previous holder keeps its MAC and type,
+    but its ip becomes unknown (BROADCAST) until it is added again.
+    """
+
+    def __init__(self, devices = None):
+        """ Arguments:
+        devices -- [optional] iterable of (ip, mac, type), e.g. Orvibo.discover().values()
+        """
+        # Devices sorted by MAC
+        self.__mac_hi = array('H')
+        self.__mac_lo = array(_U32_TYPECODE)
+        self.__ips = array(_U32_TYPECODE)
+        self.__types = bytearray()
+
+        # Known ip addresses sorted by ip with MAC of the holder
+        self.__ip_keys = array(_U32_TYPECODE)
+        self.__ip_mac_hi = array('H')
+        self.__ip_mac_lo = array(_U32_TYPECODE)
+
+        if devices is not None:
+            self.update(devices)
+
+    @staticmethod
+    def discover():
+        """ Creates fleet of all devices discovered in the local network.
+        """
+        return Fleet(Orvibo.discover().values())
+
+    def __len__(self):
+        return len(self.__mac_hi)
+
+    def __iter__(self):
+        for indx in range(len(self)):
+            yield self.__handle(indx)
+
+    def __contains__(self, mac):
+        return self.__find(_mac_key(mac)) is not None
+
+    def __repr__(self):
+        return 'Fleet[{} devices]'.format(len(self))
+
+    def __handle(self, indx):
+        return OrviboHandle(_int_to_ip(self.__ips[indx]), _key_to_mac(self.__mac_hi[indx], self.__mac_lo[indx]), _TYPES[self.__types[indx]])
+
+    def __mac_key(self, indx):
+        return (self.__mac_hi[indx], self.__mac_lo[indx])
+
+    def __find(self, key):
+        """ Index of the device with given MAC key or None.
+        """
+        indx = _bisect(self.__mac_key, len(self), key)
+        if indx < len(self) and self.__mac_key(indx) == key:
+            return indx
+        return None
+
+    def __find_ip(self, ip):
+        """ Index of the ip in ip index or None.
+        """
+        indx = bisect.bisect_left(self.__ip_keys, ip)
+        if indx < len(self.__ip_keys) and self.__ip_keys[indx] == ip:
+            return indx
+        return None
+
+    def __unindex_ip(self, ip):
+        indx = self.__find_ip(ip)
+        if indx is not None:
+            del self.__ip_keys[indx]
+            del self.__ip_mac_hi[indx]
+            del self.__ip_mac_lo[indx]
+
+    def __index_ip(self, ip, key):
+        """ Assigns ip to device with given MAC key, previous holder of the ip gets unknown ip.
+        """
+        indx = bisect.bisect_left(self.__ip_keys, ip)
+        if indx < len(self.__ip_keys) and self.__ip_keys[indx] == ip:
+            stale = self.__find((self.__ip_mac_hi[indx], self.__ip_mac_lo[indx]))
+            self.__ips[stale] = _UNKNOWN_IP
+            self.__ip_mac_hi[indx], self.__ip_mac_lo[indx] = key
+        else:
+            self.__ip_keys.insert(indx, ip)
+            self.__ip_mac_hi.insert(indx, key[0])
+            self.__ip_mac_lo.insert(indx, key[1])
+
+    def add(self, ip, mac, type = 'Unknown'):
+        """ Adds device to the fleet or updates ip and type of already known one.
+
+        returns -- OrviboHandle of the device
+        raises -- OrviboException for invalid ip, MAC or type
+        """
+        key = _mac_key(mac)
+        ip = _ip_to_int(ip)
+        code = _type_code(type)
+
+        indx = _bisect(self.__mac_key, len(self), key)
+        if indx < len(self) and self.__mac_key(indx) == key:
+            if self.__ips[indx] != _UNKNOWN_IP:
+                self.__unindex_ip(self.__ips[indx])
+            self.__types[indx] = code
+        else:
+            self.__mac_hi.insert(indx, key[0])
+            self.__mac_lo.insert(indx, key[1])
+            self.__ips.insert(indx, _UNKNOWN_IP)
+            self.__types.insert(indx, code)
+
+        if ip != _UNKNOWN_IP:
+            self.__index_ip(ip, key)
+        self.__ips[indx] = ip
+        return self.__handle(indx)
+
+    def update(self, devices):
+        """ Adds number of devices to the fleet.
+
+        devices -- iterable of (ip, mac, type)
+        """
+        for ip, mac, type in devices:
+            self.add(ip, mac, type)
+
+    def remove(self, mac):
+        """ Removes device with given MAC from the fleet.
+
+        raises -- OrviboException if device is not in the fleet
+        """
+        indx = self.__find(_mac_key(mac))
+        if indx is None:
+            raise OrviboException('Device mac={} not found in fleet.'.format(mac))
+        if self.__ips[indx] != _UNKNOWN_IP:
+            self.__unindex_ip(self.__ips[indx])
+        del self.__mac_hi[indx]
+        del self.__mac_lo[indx]
+        del self.__ips[indx]
+        del self.__types[indx]
+
+    def by_mac(self, mac):
+        """ returns -- OrviboHandle of the device with given MAC or None
+        """
+        indx = self.__find(_mac_key(mac))
+        return None if indx is None else self.__handle(indx)
+
+    def by_ip(self, ip):
+        """ returns -- OrviboHandle of the device with given ip or None
+        """
+        indx = self.__find_ip(_ip_to_int(ip))
+        if indx is None:
+            return None
+        return self.__handle(self.__find((self.__ip_mac_hi[indx], self.__ip_mac_lo[indx])))
+
+    def of_type(self, type):
+        """ returns -- list of OrviboHandle of all devices with given type
+            raises -- OrviboException for unsupported type
+        """
+        code = struct.pack('B', _type_code(type))
+        handles = []
+        indx = self.__types.find(code)
+        while indx != -1:
+            handles.append(self.__handle(indx))
+            indx = self.__types.find(code, indx + 1)
+        return handles
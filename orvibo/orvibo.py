@@ -11,7 +11,11 @@
 #   1.4 keep connection functionality implemented
 #   1.4.1 Learn/Emit logging improved
 #   1.5 Learn/Emit Orvibo SmartSwitch RF433 MHz signal support added
-__version__ = "1.5"
+#   1.6 AllOne wake up state tracking, SmartSwitch group RF433 emit
+#   1.7 Lightweight device handles and fleet table, shared logger
+#   1.8 Configurable transmit policy, packets are sent once by default
+#   1.9 Discover by ip probes device via unicast before broadcasting
+__version__ = "1.9"
 
 from contextlib import contextmanager
 import logging
@@ -20,6 +24,7 @@ import select
 import random
 import socket
 import binascii
+import threading
 import time
 import sys
 
@@ -28,6 +33,9 @@ py3 = sys.version_info[0] == 3
 BROADCAST = '255.255.255.255'
 PORT = 10000
 
+# Number of seconds to wait for unicast discover response
+PROBE_TIMEOUT = 0.5
+
 MAGIC = b'\x68\x64'
 SPACES_6 = b'\x20\x20\x20\x20\x20\x20'
 ZEROS_4 = b'\x00\x00\x00\x00'
@@ -55,12 +63,52 @@ BLAST_IR = b'\x69\x63'
 BLAST_RF433 = CONTROL
 LEARN_RF433 = CONTROL
 
+# AllOne falls asleep after a while and skips RF433 commands until
+# any IR activity wakes it up. Number of seconds it is supposed to stay awake.
+# It is a conservative guess, not a measured value, use Orvibo.awake_timeout to tune it.
+AWAKE_TIMEOUT = 30
+
+# Last time AllOne was known to be awake: {mac: time}, shared by all Orvibo objects of the same device
+_awake_times = {}
+WAKE_UP_SIGNAL = b' '
+
 class OrviboException(Exception):
     """ Module level exception class.
     """
     def __init__(self, msg):
         super(OrviboException, self).__init__(msg)
 
+class _DeviceLoggerAdapter(logging.LoggerAdapter):
+    """ Prefixes messages of the shared module logger with device address.
+    """
+    def process(self, msg, kwargs):
+        return '[{}] {}'.format(self.extra['ip'], msg), kwargs
+
+# Single logger for all devices, named loggers are never released by logging module
+_logger = logging.getLogger('Orvibo')
+
+def _device_logger(ip):
+    """ Creates lightweight logger for device with given ip.
+    """
+    return _DeviceLoggerAdapter(_logger, {'ip': ip})
+
+def _mac_bytes(mac):
+    """ Converts MAC address to 6 bytes binary form.
+
+    mac -- hex string (e.g 'acdf4377dfcc') or 6 bytes binary MAC
+    """
+    if mac is None:
+        return None
+    if isinstance(mac, (bytes, bytearray)) and len(mac) == 6:
+        return bytes(mac)
+    try:
+        binary = binascii.unhexlify(mac)
+    except (TypeError, ValueError, binascii.Error):
+        raise OrviboException('Invalid MAC address: {}'.format(mac))
+    if len(binary) != 6:
+        raise OrviboException('Invalid MAC address: {}'.format(mac))
+    return binary
+
 def _reverse_bytes(mac):
     """ Helper method to reverse bytes order.
 
@@ -141,6 +189,73 @@ def _orvibo_socket(external_socket = None):
     else:
         pass
 
+class TransmitPolicy(object):
+    """ Defines how many copies of each packet are sent and spacing between them.
+
+    Every Orvibo object gets its own policy by default, so transmit counters
+    are per device. Counters of the policy shared between devices are accumulated by all of them.
+    """
+
+    # Device performs action for every copy of these commands (switch toggle, IR/RF433 emit),
+    # so they are never sent more than once.
+    NOT_IDEMPOTENT = (CONTROL, BLAST_IR)
+
+    def __init__(self, copies = 1, spacing = 0.05, commands = None):
+        """ Arguments:
+        copies -- number of copies of each packet to send
+        spacing -- number of seconds between copies
+        commands -- [optional] map {cmd: (copies, spacing)} to override defaults for exact command types
+        """
+        self.copies = copies
+        self.spacing = spacing
+        self.commands = dict(commands) if commands is not None else {}
+
+        self.packets = 0    # packets requested to send
+        self.sent = 0       # datagrams actually sent
+        self.suppressed = 0 # redundant copies of not idempotent commands skipped
+        self.__lock = threading.Lock()
+
+    def __repr__(self):
+        return 'TransmitPolicy[copies={}, spacing={}]'.format(self.copies, self.spacing)
+
+    def plan(self, cmd):
+        """ Number of copies and spacing for given command.
+
+        Arguments:
+        cmd -- 2 bytes command of the orvibo packet
+
+        returns -- (copies, spacing)
+        """
+        copies, spacing = self.commands.get(cmd, (self.copies, self.spacing))
+        copies = max(1, copies)
+        if copies > 1 and cmd in self.NOT_IDEMPOTENT:
+            self.count(suppressed=copies - 1)
+            copies = 1
+        return copies, spacing
+
+    def count(self, packets = 0, sent = 0, suppressed = 0):
+        """ Updates transmit counters.
+        """
+        with self.__lock:
+            self.packets += packets
+            self.sent += sent
+            self.suppressed += suppressed
+
+    def metrics(self):
+        """ Policy settings and transmit counters.
+        """
+        commands = {}
+        for cmd, plan in self.commands.items():
+            commands[binascii.hexlify(cmd).decode('utf-8')] = plan
+
+        with self.__lock:
+            return {'copies': self.copies,
+                    'spacing': self.spacing,
+                    'commands': commands,
+                    'packets': self.packets,
+                    'sent': self.sent,
+                    'suppressed': self.suppressed}
+
 class Packet:
     """ Represents response sender/recepient address and binary data.
     """
@@ -173,26 +288,36 @@ class Packet:
         return self.data[2:4]
 
 
-    def send(self, sock, timeout = 10):
+    def send(self, sock, timeout = 10, policy = None):
         """ Sends binary packet via socket.
 
         Arguments:
         sock -- socket to send through
-        packet -- byte string to send
         timeout -- number of seconds to wait for sending operation
+        policy -- [optional] TransmitPolicy, packet is sent once by default
         """
         if self.data is None:
             # Nothing to send
             return
 
-        for i in range(timeout):
-            r, w, x = select.select([], [sock], [sock], 1)
+        if policy is None:
+            policy = TransmitPolicy()
+
+        copies, spacing = policy.plan(self.cmd)
+        policy.count(packets=1)
+
+        for i in range(copies):
+            if i > 0:
+                time.sleep(spacing)
+
+            r, w, x = select.select([], [sock], [sock], timeout)
             if sock in w:
                 sock.sendto(bytearray(self.data), (self.ip, PORT))
+                policy.count(sent=1)
             elif sock in x:
                 raise OrviboException("Failed while sending packet.")
             else:
-                # nothing to send
+                # socket is not ready to send
                 break
 
     @staticmethod
@@ -223,6 +348,38 @@ class Packet:
 
         return response
 
+    @staticmethod
+    def recv_from(sock, ip, expectResponseType = None, timeout = 1):
+        """ Receive first packet of given type from exact ip address
+
+        Arguments:
+        sock -- socket to listen to
+        ip -- ip address of the sender
+        expectResponseType -- 2 bytes packet command type to filter result data
+        timeout -- number of seconds to wait for response
+
+        returns -- Packet or None if nothing received during timeout
+        """
+        deadline = time.time() + timeout
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return None
+
+            r, w, x = select.select([sock], [], [sock], remaining)
+            if sock in x:
+                raise OrviboException('Getting response failed')
+            if sock not in r:
+                return None
+
+            data, addr = sock.recvfrom(1024)
+            if addr[0] != ip:
+                continue
+            if expectResponseType is not None and data[4:6] != expectResponseType:
+                continue
+
+            return Packet(addr[0], data, Packet.Response)
+
     @staticmethod
     def recv_all(sock, expectResponseType = None, timeout = 10):
        res = None
@@ -256,26 +413,21 @@ class Orvibo(object):
     TYPE_SOCKET = 'socket'
     TYPE_IRDA = 'irda'
 
-    def __init__(self, ip, mac = None, type = 'Unknown'):
+    # Number of seconds AllOne is supposed to stay awake after last activity
+    awake_timeout = AWAKE_TIMEOUT
+
+    def __init__(self, ip, mac = None, type = 'Unknown', transmit_policy = None):
         self.ip = ip
         self.type = type
+        self.transmit_policy = transmit_policy if transmit_policy is not None else TransmitPolicy()
         self.__last_subscr_time = time.time() - 1 # Orvibo doesn't like subscriptions frequently that 1 in 0.1sec
-        self.__logger = logging.getLogger('{}@{}'.format(self.__class__.__name__, ip))
+        self.__logger = _device_logger(ip)
         self.__socket = None
-        self.mac = mac
-
-        # TODO: make this tricky code clear
-        if py3 and isinstance(mac, str):
-            self.mac = binascii.unhexlify(mac)
-        else:
-            try:
-                self.mac = binascii.unhexlify(mac)
-            except:
-                pass
+        self.mac = _mac_bytes(mac)
 
         if mac is None:
             self.__logger.debug('MAC address is not provided. Discovering..')
-            d = Orvibo.discover(self.ip)
+            d = Orvibo.discover(self.ip, self.transmit_policy)
             self.mac = d.mac
             self.type = d.type
 
@@ -316,23 +468,30 @@ class Orvibo(object):
         return "Orvibo[type={}, ip={}, mac={}]".format(self.type, 'Unknown' if self.ip == BROADCAST else self.ip, mac.decode('utf-8') if py3 else mac)
 
     @staticmethod
-    def discover(ip = None):
+    def discover(ip = None, policy = None):
         """ Discover all/exact devices in the local network
 
         Arguments:
         ip -- ip address of the discovered device
+        policy -- [optional] TransmitPolicy for discover packet
 
         returns -- map {ip : (ip, mac, type)} of all discovered devices if ip argument is None
                    Orvibo object that represents device at address ip.
         raises -- OrviboException if requested ip not found
         """
+        if ip is not None:
+            device = Orvibo.probe(ip, policy=policy)
+            if device is not None:
+                return device
+            _logger.debug('No unicast discover response from {}, broadcasting'.format(ip))
+
         devices = {}
         with _orvibo_socket() as s:
-            logger = logging.getLogger(Orvibo.__class__.__name__)
+            logger = _logger
             logger.debug('Discovering Orvibo devices')
             discover_packet = Packet(BROADCAST)
             discover_packet.compile(DISCOVER)
-            discover_packet.send(s)
+            discover_packet.send(s, policy=policy)
 
             for indx in range(512): # supposer there are less then 512 devices in the network
                 p = discover_packet.recv(s)
@@ -355,7 +514,33 @@ class Orvibo(object):
         if ip not in devices.keys():
             raise OrviboException('Device ip={} not found in {}.'.format(ip, devices.keys()))
 
-        return Orvibo(*devices[ip])
+        return Orvibo(*devices[ip], transmit_policy=policy)
+
+    @staticmethod
+    def probe(ip, timeout = PROBE_TIMEOUT, policy = None):
+        """ Discover exact device via unicast discover packet
+
+        Arguments:
+        ip -- ip address of the device
+        timeout -- number of seconds to wait for response
+        policy -- [optional] TransmitPolicy for discover packet
+
+        returns -- Orvibo object that represents device at address ip or None if device doesn't respond
+        """
+        with _orvibo_socket() as s:
+            _logger.debug('Probing Orvibo device at {}'.format(ip))
+            discover_packet = Packet(ip).compile(DISCOVER)
+            discover_packet.send(s, policy=policy)
+
+            deadline = time.time() + timeout
+            while True:
+                p = Packet.recv_from(s, ip, DISCOVER_RESP, deadline - time.time())
+                if p is None:
+                    return None
+
+                orvibo_type, orvibo_mac = _parse_discover_response(p.data)
+                if orvibo_mac:
+                    return Orvibo(ip, orvibo_mac, orvibo_type, policy)
 
     def subscribe(self):
         """ Subscribe to device.
@@ -379,7 +564,7 @@ class Orvibo(object):
 
         subscr_packet = Packet(self.ip)
         subscr_packet.compile(SUBSCRIBE, self.mac, SPACES_6, _reverse_bytes(self.mac), SPACES_6)
-        subscr_packet.send(s)
+        subscr_packet.send(s, policy=self.transmit_policy)
         response = subscr_packet.recv_all(s, SUBSCRIBE_RESP)
 
         self.__last_subscr_time = time.time()
@@ -413,7 +598,7 @@ class Orvibo(object):
             self.__logger.debug('Socket is switching {}'.format('on' if switchOn else 'off'))
             on_off_packet = Packet(self.ip)
             on_off_packet.compile(CONTROL, self.mac, SPACES_6, ZEROS_4, state)
-            on_off_packet.send(s)
+            on_off_packet.send(s, policy=self.transmit_policy)
             if on_off_packet.recv(s, CONTROL_RESP) is None:
                 self.__logger.warn('Socket switching {} failed.'.format('on' if switchOn else 'off'))
                 return False
@@ -448,17 +633,67 @@ class Orvibo(object):
         """
         return self.learn(self, fname, timeout)
 
+    @property
+    def awake(self):
+        """ True if AllOne is supposed to be awake and ready for RF433 commands.
+        """
+        last_awake_time = _awake_times.get(self.mac)
+        if last_awake_time is None:
+            return False
+        return time.time() - last_awake_time < self.awake_timeout
+
+    def __mark_awake(self, awake = True):
+        if awake:
+            _awake_times[self.mac] = time.time()
+        else:
+            _awake_times.pop(self.mac, None)
+
+    def __wake_up(self, s, force = False):
+        """ Wakes AllOne up with minimal IR packet if it is supposed to be asleep.
+
+        Arguments:
+        s -- socket to use for waking up
+        force -- wake up even if device is supposed to be awake
+
+        returns -- True if device is awake, otherwise False
+        """
+        if self.awake and not force:
+            return True
+
+        if self.__subscribe(s) is None:
+            self.__logger.warn('Subscription failed while waking up AllOne')
+            return False
+
+        self.__logger.debug('Waking up AllOne')
+        wake_packet = Packet(self.ip).compile(BLAST_IR, self.mac, SPACES_6, b'\x65\x00\x00\x00', _packet_id(), WAKE_UP_SIGNAL)
+        wake_packet.send(s, policy=self.transmit_policy)
+        # Wait for the blast confirmation only, no need to drain the socket
+        if wake_packet.recv(s, BLAST_IR) is None:
+            self.__logger.warn('AllOne did not confirm wake up')
+            return False
+
+        self.__mark_awake()
+        return True
+
     def learn_rf433(self, fname = None):
         """ Learn Orvibo SmartSwitch RF433 signal.
+
+        Arguments:
+        fname -- [optional] file name to store RF433 key to
+
+        returns -- 7 bytes RF433 key or None if learning failed
         """
         # It is actually the same packet as for RF433 signal emit.
         key = _random_n_bytes(7)
-        
+
+        if not self._learn_emit_rf433(1, key):
+            self.__logger.warn('Failed to send RF433 key to SmartSwitch')
+            return None
+
         if fname is not None:
             with open(fname, 'wb') as f:
                 f.write(key)
 
-        self._learn_emit_rf433(1, key)
         return key
 
     def learn(self, fname = None, timeout = 15):
@@ -484,7 +719,7 @@ class Orvibo(object):
             self.__logger.debug('Entering to Learning IR/RF433 mode')
 
             learn_packet = Packet(self.ip).compile(LEARN_IR, self.mac, SPACES_6, b'\x01\x00', ZEROS_4)
-            learn_packet.send(s)
+            learn_packet.send(s, policy=self.transmit_policy)
             if learn_packet.recv(s, LEARN_IR_RESP) is None:
                 self.__logger.warn('Failed to enter to Learning IR/RF433 mode')
                 return
@@ -517,6 +752,7 @@ class Orvibo(object):
 
                 self.__logger.debug('Skipped:\nUnexpected packet = {}'.format(_debug_data(packet_with_signal.data)))
 
+            self.__mark_awake()
             signal_split = packet_with_signal.data.split(self.mac + SPACES_6, 1)
             signal = signal_split[1][6:]
 
@@ -529,16 +765,48 @@ class Orvibo(object):
 
             return signal
 
-    def _learn_emit_rf433(self, on, key):
+    def _learn_emit_rf433(self, on, *keys):
         """ Learn/emit SmartSwitch RF433 signal.
+
+        Arguments:
+        on -- True to switch on, False to switch off
+        *keys -- 7 bytes SmartSwitch keys, all of them are sent via single connection
+
+        returns -- True if signals are sent, otherwise False
         """
         with _orvibo_socket(self.__socket) as s:
-                                                                                     # this also comes with 64 62 packet
-            signal_packet = Packet(self.ip).compile(BLAST_RF433, self.mac, SPACES_6, key[:4],\
-                        _packet_id(), b'\x01' if on else b'\x00', b'\x29\x00', key[4:])
-            signal_packet.send(s)
-            signal_packet.recv_all(s)
-            self.__logger.debug('{}'.format(signal_packet))
+            if not self.__wake_up(s):
+                return False
+
+            for key in keys:
+                if self.__send_rf433(s, on, key):
+                    continue
+
+                # AllOne fell asleep earlier than expected, wake it up and try once again
+                self.__logger.debug('RF433 signal is not confirmed, waking up AllOne')
+                self.__mark_awake(False)
+                if not self.__wake_up(s, force=True) or not self.__send_rf433(s, on, key):
+                    self.__logger.warn('RF433 signal is not confirmed by AllOne')
+                    return False
+
+            return True
+
+    def __send_rf433(self, s, on, key):
+        """ Sends single SmartSwitch RF433 signal.
+
+        returns -- True if AllOne confirmed the signal, otherwise False
+        """
+                                                                                 # this also comes with 64 62 packet
+        signal_packet = Packet(self.ip).compile(BLAST_RF433, self.mac, SPACES_6, key[:4],\
+                    _packet_id(), b'\x01' if on else b'\x00', b'\x29\x00', key[4:])
+        signal_packet.send(s, policy=self.transmit_policy)
+        response = signal_packet.recv_all(s)
+        self.__logger.debug('{}'.format(signal_packet))
+        if response is None:
+            return False
+
+        self.__mark_awake()
+        return True
 
     def emit_rf433(self, on, fname):
         """ Emit RF433 signal for Orvibo SmartSwitch only.
@@ -547,7 +815,23 @@ class Orvibo(object):
         with open(fname, 'rb') as f:
             key = f.read()
 
-        self._learn_emit_rf433(on, key)
+        return self._learn_emit_rf433(on, key)
+
+    def emit_rf433_group(self, on, fnames):
+        """ Emit RF433 signals for group of Orvibo SmartSwitches at once.
+
+        Arguments:
+        on -- True to switch group on, False to switch off
+        fnames -- list of files with SmartSwitch RF433 keys
+
+        returns -- True if emit success, otherwise False
+        """
+        keys = []
+        for fname in fnames:
+            with open(fname, 'rb') as f:
+                keys.append(f.read())
+
+        return self._learn_emit_rf433(on, *keys)
 
 
     def emit_ir(self, signal):
@@ -575,8 +859,12 @@ class Orvibo(object):
                     signal = f.read()
 
             signal_packet = Packet(self.ip).compile(BLAST_IR, self.mac, SPACES_6, b'\x65\x00\x00\x00', _packet_id(), signal)
-            signal_packet.send(s)
-            signal_packet.recv_all(s)
+            signal_packet.send(s, policy=self.transmit_policy)
+            if signal_packet.recv_all(s) is None:
+                self.__logger.warn('IR signal emit is not confirmed by AllOne')
+                return True
+
+            self.__mark_awake()
             self.__logger.info('IR signal emit successfuly')
             return True
 
@@ -732,18 +1020,19 @@ if __name__ == '__main__':
             print('Already {}.'.format('enabled' if o.switch else 'disabled'))
    elif d.type == Orvibo.TYPE_IRDA:
       if o.emit_rf():
-         # It is required to wake up AllOne
-         d.emit_ir(b' ')
-         d.emit_rf433(o.switch, o.emitFile)
-         print('Emit RF done.')
+         if d.emit_rf433(o.switch, o.emitFile):
+            print('Emit RF done.')
+         else:
+            print('Emit RF failed.')
       elif o.emit_ir():
          d.emit_ir(o.emitFile)
          print('Emit IR done.')
       elif o.teach_rf():
-         # It is required to wake up AllOne
-         d.emit_ir(b' ')
          signal = d.learn_rf433(o.teachFile)
-         print('Teach RF done.')
+         if signal is not None:
+            print('Teach RF done.')
+         else:
+            print('Teach RF failed.')
       elif o.teach_ir():
          signal = d.learn(o.teachFile)
          print('Teach IR done')
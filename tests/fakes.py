@@ -0,0 +1,83 @@
+""" Orvibo devices emulated on loopback addresses for tests.
+"""
+
+import socket
+import struct
+import threading
+import unittest
+
+from orvibo import orvibo
+
+def _free_port():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+class FakeAllOne(object):
+    """ AllOne answering on loopback address.
+
+    Asleep device skips RF433 (CONTROL) packets until IR signal is emitted.
+    """
+
+    def __init__(self, ip = '127.0.0.2', mac = b'\xac\xcf\x43\x78\xef\xdc'):
+        self.ip = ip
+        self.mac = mac
+        self.awake = True
+        self.ignore = set()  # commands left without response
+        self.received = []   # commands of all received packets
+
+        self.__sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.__sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.__sock.bind((ip, orvibo.PORT))
+        self.__sock.settimeout(0.05)
+        self.__running = True
+        self.__thread = threading.Thread(target=self.__run)
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def close(self):
+        self.__running = False
+        self.__thread.join()
+        self.__sock.close()
+
+    def __run(self):
+        while self.__running:
+            try:
+                data, addr = self.__sock.recvfrom(1024)
+            except socket.timeout:
+                continue
+
+            cmd = data[4:6]
+            self.received.append(cmd)
+            response = self.response(cmd)
+            if response is not None:
+                self.__sock.sendto(response, addr)
+
+    def response(self, cmd):
+        if cmd in self.ignore:
+            return None
+
+        if cmd == orvibo.DISCOVER:
+            body = b'\x00' + self.mac + orvibo.SPACES_6 + self.mac[::-1] + orvibo.SPACES_6 + b'IRD005'
+        elif cmd == orvibo.BLAST_IR:
+            self.awake = True
+            body = b'\x00'
+        elif cmd == orvibo.CONTROL and not self.awake:
+            return None
+        else:
+            body = b'\x00'
+        return orvibo.MAGIC + struct.pack('>H', len(body) + 6) + cmd + body
+
+class LoopbackTestCase(unittest.TestCase):
+    """ Runs orvibo module on free port, so fake devices don't interfere with real ones.
+    """
+
+    def setUp(self):
+        self.__port = orvibo.PORT
+        orvibo.PORT = _free_port()
+        orvibo._awake_times.clear()
+
+    def tearDown(self):
+        orvibo.PORT = self.__port
@@ -0,0 +1,138 @@
+import struct
+import unittest
+
+try:
+    import numpy
+    from orvibo.analysis import SignalLibrary, decode, fingerprint, timings
+except ImportError:
+    numpy = None
+
+from orvibo import OrviboException
+
+def _signal(durations):
+    """ AllOne IR payload with given durations in microseconds.
+    """
+    body = struct.pack('<{}H'.format(len(durations)), *durations)
+    return struct.pack('<H', len(body)) + body
+
+def _nec(code, scale = 1.0):
+    """ NEC-like signal of 8 bits code, scale emulates timing jitter.
+    """
+    durations = [9000, 4500]
+    for bit in range(8):
+        durations += [560, 1690 if (code >> bit) & 1 else 560]
+    durations += [560, 40000]
+    return _signal([int(d * scale) for d in durations])
+
+def _ac(code):
+    """ Air conditioner like signal of 112 bits code, longer than fingerprint.
+    """
+    durations = [3500, 1750]
+    for bit in range(112):
+        durations += [430, 1300 if (code >> bit) & 1 else 430]
+    durations += [430, 40000]
+    return _signal(durations)
+
+def _bucketed(buckets):
+    """ Signal, which durations fall into given fingerprint buckets.
+    """
+    return _signal([int(round(16 * 2 ** ((b - 1) / 8.0))) for b in buckets])
+
+@unittest.skipIf(numpy is None, 'numpy is required')
+class DecodeTest(unittest.TestCase):
+
+    def test_long_duration(self):
+        self.assertEqual(list(timings(_signal([9000, 4500, 560, 40000]))), [9000, 4500, 560, 40000])
+
+    def test_pulses_and_spaces(self):
+        pulses, spaces = decode(_signal([9000, 4500, 560, 1690, 560]))
+        self.assertEqual(list(pulses), [9000, 560, 560])
+        self.assertEqual(list(spaces), [4500, 1690])
+
+    def test_fingerprint(self):
+        fp = fingerprint(_nec(5))
+        self.assertEqual(fp.dtype, numpy.uint8)
+        self.assertEqual(numpy.count_nonzero(fp), 20)
+        self.assertTrue(fp[19] > fp[0])
+
+@unittest.skipIf(numpy is None, 'numpy is required')
+class SignalLibraryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.library = SignalLibrary()
+        for code in range(20):
+            self.library.add('code{}'.format(code), _nec(code))
+
+    def test_match(self):
+        self.assertEqual([name for name, distance in self.library.match(_nec(7, 1.05))], ['code7'])
+        self.assertEqual(self.library.match(_nec(7))[0], ('code7', 0))
+        self.assertEqual(len(self.library.match(_nec(7), k=3, jitter=None)), 3)
+        self.assertEqual(self.library.match(_nec(200)), [])
+        self.assertRaises(OrviboException, self.library.match, _nec(7), 0)
+
+    def test_dedupe(self):
+        self.library.add('code3_again', _nec(3, 1.05))
+        self.library.add('code3_exact', _nec(3))
+        self.library.add('code9_again', _nec(9, 0.95))
+
+        self.assertEqual(sorted(self.library.duplicates()), [['code3', 'code3_again', 'code3_exact'], ['code9', 'code9_again']])
+        self.assertEqual(self.library.dedupe(), ['code3_again', 'code3_exact', 'code9_again'])
+        self.assertEqual(len(self.library), 20)
+        self.assertEqual(self.library.duplicates(), [])
+        self.assertEqual(self.library.match(_nec(3))[0], ('code3', 0))
+
+        self.library.add('code100', _nec(100))
+        self.assertEqual(self.library.match(_nec(100))[0], ('code100', 0))
+
+    def test_empty(self):
+        library = SignalLibrary()
+        self.assertEqual(len(library), 0)
+        self.assertEqual(library.match(_nec(1)), [])
+        self.assertEqual(library.duplicates(), [])
+        self.assertEqual(library.dedupe(), [])
+
+@unittest.skipIf(numpy is None, 'numpy is required')
+class LongSignalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.library = SignalLibrary()
+        # Codes differ only in the last byte, e.g. temperature
+        self.library.add('ac20', _ac(20 << 104))
+        self.library.add('ac21', _ac(21 << 104))
+        # Codes differ only in the middle, so their fingerprints are the same
+        self.library.add('mid1', _ac(1 << 60))
+        self.library.add('mid2', _ac(2 << 60))
+
+    def test_fingerprint(self):
+        self.assertEqual(len(timings(_ac(0))), 228)
+        self.assertFalse(numpy.array_equal(fingerprint(_ac(20 << 104)), fingerprint(_ac(21 << 104))))
+        self.assertTrue(numpy.array_equal(fingerprint(_ac(1 << 60)), fingerprint(_ac(2 << 60))))
+
+    def test_match(self):
+        self.assertEqual(self.library.match(_ac(21 << 104), k=4), [('ac21', 0)])
+        self.assertEqual(self.library.match(_ac(2 << 60), k=4), [('mid2', 0)])
+        self.assertEqual(self.library.match(_ac(2 << 60), k=2, jitter=None)[0], ('mid2', 0))
+
+    def test_dedupe(self):
+        self.assertEqual(self.library.duplicates(), [])
+        self.assertEqual(self.library.dedupe(), [])
+        self.assertEqual(len(self.library), 4)
+
+        self.library.add('mid2_again', _ac(2 << 60))
+        self.assertEqual(self.library.dedupe(), ['mid2_again'])
+        self.assertEqual(self.library.match(_ac(2 << 60), k=4), [('mid2', 0)])
+
+    def test_first_added_kept(self):
+        library = SignalLibrary()
+        # m1 and m2 are both within jitter from o, but not from each other
+        library.add('m1', _bucketed([12, 8]))
+        library.add('o', _bucketed([10, 10]))
+        library.add('m2', _bucketed([10, 12]))
+        self.assertEqual(list(library.fingerprints[:, :2].tolist()), [[12, 8], [10, 10], [10, 12]])
+
+        self.assertEqual(library.duplicates(), [['m1', 'o']])
+        self.assertEqual(library.dedupe(), ['o'])
+        self.assertEqual(library.names, ['m1', 'm2'])
+
+if __name__ == '__main__':
+    unittest.main()
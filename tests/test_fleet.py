@@ -0,0 +1,75 @@
+import unittest
+
+from orvibo import BROADCAST, Orvibo, OrviboException
+from orvibo.fleet import Fleet, OrviboHandle
+
+SOCKET_MAC = 'acdf4377dfcc'
+IRDA_MAC = 'accf4378efdc'
+
+class FleetTest(unittest.TestCase):
+
+    def setUp(self):
+        self.fleet = Fleet([('192.168.1.45', SOCKET_MAC, Orvibo.TYPE_SOCKET),
+                            ('192.168.1.37', IRDA_MAC, Orvibo.TYPE_IRDA)])
+
+    def test_lookup(self):
+        self.assertEqual(len(self.fleet), 2)
+        self.assertEqual(self.fleet.by_mac(SOCKET_MAC), OrviboHandle('192.168.1.45', SOCKET_MAC, Orvibo.TYPE_SOCKET))
+        self.assertEqual(self.fleet.by_ip('192.168.1.37').mac, b'\xac\xcf\x43\x78\xef\xdc')
+        self.assertEqual([h.ip for h in self.fleet.of_type(Orvibo.TYPE_IRDA)], ['192.168.1.37'])
+        self.assertTrue(b'\xac\xdf\x43\x77\xdf\xcc' in self.fleet)
+        self.assertIsNone(self.fleet.by_ip('192.168.1.1'))
+        self.assertIsNone(self.fleet.by_mac('000000000001'))
+
+    def test_sorted_by_mac(self):
+        self.fleet.add('10.0.0.1', 'ffffffffffff')
+        self.fleet.add('10.0.0.2', '000000000000')
+        self.assertEqual([h.ip for h in self.fleet], ['10.0.0.2', '192.168.1.37', '192.168.1.45', '10.0.0.1'])
+
+    def test_ip_taken_by_another_device(self):
+        self.fleet.add('192.168.1.45', '000000000001', Orvibo.TYPE_SOCKET)
+        self.assertEqual(self.fleet.by_ip('192.168.1.45').mac, b'\x00\x00\x00\x00\x00\x01')
+        self.assertEqual(self.fleet.by_mac(SOCKET_MAC).ip, BROADCAST)
+        self.assertEqual(len(self.fleet), 3)
+
+    def test_device_ip_changed(self):
+        self.fleet.add('192.168.1.50', SOCKET_MAC, Orvibo.TYPE_SOCKET)
+        self.assertIsNone(self.fleet.by_ip('192.168.1.45'))
+        self.assertEqual(self.fleet.by_ip('192.168.1.50').mac, b'\xac\xdf\x43\x77\xdf\xcc')
+        self.assertEqual(len(self.fleet), 2)
+
+    def test_remove(self):
+        self.fleet.remove(SOCKET_MAC)
+        self.assertIsNone(self.fleet.by_ip('192.168.1.45'))
+        self.assertEqual(self.fleet.of_type(Orvibo.TYPE_SOCKET), [])
+        self.assertRaises(OrviboException, self.fleet.remove, SOCKET_MAC)
+
+    def test_empty(self):
+        fleet = Fleet()
+        self.assertEqual(len(fleet), 0)
+        self.assertEqual(list(fleet), [])
+        self.assertIsNone(fleet.by_ip('192.168.1.45'))
+        self.assertEqual(fleet.of_type(Orvibo.TYPE_SOCKET), [])
+
+    def test_invalid_arguments(self):
+        self.assertRaises(OrviboException, self.fleet.add, '1.2.3.4', 'abcd')
+        self.assertRaises(OrviboException, self.fleet.add, '1.2.3.4', SOCKET_MAC, 'foo')
+        self.assertRaises(OrviboException, self.fleet.add, 'nope', SOCKET_MAC)
+        self.assertRaises(OrviboException, self.fleet.by_ip, 'nope')
+        self.assertRaises(OrviboException, self.fleet.of_type, 'bogus')
+        self.assertRaises(OrviboException, OrviboHandle, '1.2.3.4', 'abcd')
+        self.assertEqual(len(self.fleet), 2)
+        self.assertEqual(self.fleet.by_mac(SOCKET_MAC).type, Orvibo.TYPE_SOCKET)
+
+    def test_unknown_type(self):
+        self.fleet.add('10.0.0.1', '000000000001', None)
+        self.assertEqual([h.ip for h in self.fleet.of_type('Unknown')], ['10.0.0.1'])
+
+    def test_exports(self):
+        import orvibo
+        self.assertTrue(hasattr(orvibo, 'Fleet'))
+        self.assertFalse(hasattr(orvibo, 'bisect'))
+        self.assertFalse(hasattr(orvibo, 'array'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import socket
+import unittest
+import struct
+import time
+
+from orvibo import orvibo
+from orvibo import Orvibo, OrviboException, Packet, DISCOVER, DISCOVER_RESP, SUBSCRIBE
+
+from fakes import FakeAllOne, LoopbackTestCase
+
+def _packet(cmd):
+    return orvibo.MAGIC + struct.pack('>H', 7) + cmd + b'\x00'
+
+class RecvFromTest(LoopbackTestCase):
+
+    def test_other_addresses_are_ignored(self):
+        receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        receiver.bind(('127.0.0.1', 0))
+        senders = []
+        try:
+            for ip, cmd in [('127.0.0.3', DISCOVER_RESP), ('127.0.0.2', SUBSCRIBE), ('127.0.0.2', DISCOVER_RESP)]:
+                sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                sender.bind((ip, 0))
+                sender.sendto(_packet(cmd), receiver.getsockname())
+                senders.append(sender)
+
+            packet = Packet.recv_from(receiver, '127.0.0.2', DISCOVER_RESP)
+            self.assertEqual((packet.ip, packet.cmd), ('127.0.0.2', DISCOVER_RESP))
+            self.assertIsNone(Packet.recv_from(receiver, '127.0.0.2', DISCOVER_RESP, 0.1))
+        finally:
+            receiver.close()
+            for sender in senders:
+                sender.close()
+
+class ProbeTest(LoopbackTestCase):
+
+    def setUp(self):
+        super(ProbeTest, self).setUp()
+        self.allone = FakeAllOne()
+
+    def tearDown(self):
+        self.allone.close()
+        super(ProbeTest, self).tearDown()
+
+    def test_probe(self):
+        device = Orvibo.probe(self.allone.ip)
+        self.assertEqual((device.ip, device.mac, device.type), (self.allone.ip, self.allone.mac, Orvibo.TYPE_IRDA))
+        self.assertEqual(self.allone.received, [DISCOVER])
+
+    def test_discover_uses_probe(self):
+        device = Orvibo.discover(self.allone.ip)
+        self.assertEqual(device.mac, self.allone.mac)
+
+    def test_no_response(self):
+        self.allone.ignore.add(DISCOVER)
+        start = time.time()
+        self.assertIsNone(Orvibo.probe(self.allone.ip))
+        elapsed = time.time() - start
+        self.assertTrue(orvibo.PROBE_TIMEOUT <= elapsed < orvibo.PROBE_TIMEOUT + 0.5)
+        self.assertEqual(self.allone.received, [DISCOVER])
+
+    def test_fallback_to_broadcast(self):
+        self.allone.ignore.add(DISCOVER)
+        self.assertRaises(OrviboException, Orvibo.discover, self.allone.ip)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import socket
+import unittest
+
+from orvibo import orvibo
+from orvibo import Packet, TransmitPolicy, BLAST_IR, CONTROL, DISCOVER, SUBSCRIBE
+
+from fakes import LoopbackTestCase
+
+class TransmitPolicyTest(unittest.TestCase):
+
+    def test_plan(self):
+        policy = TransmitPolicy(copies=2, spacing=0.1, commands={SUBSCRIBE: (3, 0.01)})
+        self.assertEqual(policy.plan(SUBSCRIBE), (3, 0.01))
+        self.assertEqual(policy.plan(DISCOVER), (2, 0.1))
+        self.assertEqual(TransmitPolicy(copies=0).plan(DISCOVER)[0], 1)
+
+    def test_not_idempotent_commands_are_sent_once(self):
+        policy = TransmitPolicy(copies=3, commands={CONTROL: (5, 0.01)})
+        self.assertEqual(policy.plan(CONTROL), (1, 0.01))
+        self.assertEqual(policy.plan(BLAST_IR)[0], 1)
+        self.assertEqual(policy.suppressed, 6)
+
+    def test_metrics(self):
+        policy = TransmitPolicy(commands={SUBSCRIBE: (3, 0.01)})
+        policy.count(packets=1, sent=3)
+        self.assertEqual(policy.metrics(), {'copies': 1,
+                                            'spacing': 0.05,
+                                            'commands': {'636c': (3, 0.01)},
+                                            'packets': 1,
+                                            'sent': 3,
+                                            'suppressed': 0})
+
+class SendTest(LoopbackTestCase):
+
+    def setUp(self):
+        super(SendTest, self).setUp()
+        self.receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.receiver.bind(('127.0.0.2', orvibo.PORT))
+        self.receiver.settimeout(0.2)
+        self.sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def tearDown(self):
+        self.receiver.close()
+        self.sender.close()
+        super(SendTest, self).tearDown()
+
+    def received(self):
+        commands = []
+        try:
+            while True:
+                commands.append(self.receiver.recv(1024)[4:6])
+        except socket.timeout:
+            return commands
+
+    def test_sent_once_by_default(self):
+        Packet('127.0.0.2').compile(SUBSCRIBE, b'\x00').send(self.sender)
+        self.assertEqual(self.received(), [SUBSCRIBE])
+
+    def test_redundant_copies(self):
+        policy = TransmitPolicy(commands={SUBSCRIBE: (3, 0.01), CONTROL: (5, 0.01)})
+        Packet('127.0.0.2').compile(SUBSCRIBE, b'\x00').send(self.sender, policy=policy)
+        Packet('127.0.0.2').compile(CONTROL, b'\x00').send(self.sender, policy=policy)
+        self.assertEqual(self.received(), [SUBSCRIBE] * 3 + [CONTROL])
+
+        metrics = policy.metrics()
+        self.assertEqual((metrics['packets'], metrics['sent'], metrics['suppressed']), (2, 4, 4))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from orvibo import Orvibo, BLAST_IR, CONTROL, SUBSCRIBE
+
+from fakes import FakeAllOne, LoopbackTestCase
+
+KEY = b'\x01\x02\x03\x04\x05\x06\x07'
+
+class WakeUpTest(LoopbackTestCase):
+
+    def setUp(self):
+        super(WakeUpTest, self).setUp()
+        self.allone = FakeAllOne()
+        self.device = Orvibo(self.allone.ip, self.allone.mac, Orvibo.TYPE_IRDA)
+
+    def tearDown(self):
+        self.allone.close()
+        super(WakeUpTest, self).tearDown()
+
+    def test_wakes_up_sleeping_allone(self):
+        self.allone.awake = False
+        self.assertTrue(self.device._learn_emit_rf433(True, KEY))
+        self.assertEqual(self.allone.received, [SUBSCRIBE, BLAST_IR, CONTROL])
+        self.assertTrue(self.device.awake)
+
+    def test_no_wake_up_while_awake(self):
+        self.assertTrue(self.device._learn_emit_rf433(True, KEY))
+        del self.allone.received[:]
+        self.assertTrue(self.device._learn_emit_rf433(False, KEY, KEY))
+        self.assertEqual(self.allone.received, [CONTROL, CONTROL])
+
+    def test_awake_state_is_shared_by_mac(self):
+        self.assertTrue(self.device._learn_emit_rf433(True, KEY))
+        self.assertTrue(Orvibo(self.allone.ip, self.allone.mac, Orvibo.TYPE_IRDA).awake)
+
+    def test_resend_after_early_sleep(self):
+        self.assertTrue(self.device._learn_emit_rf433(True, KEY))
+        self.allone.awake = False
+        del self.allone.received[:]
+        self.assertTrue(self.device._learn_emit_rf433(True, KEY))
+        self.assertEqual(self.allone.received, [CONTROL, SUBSCRIBE, BLAST_IR, CONTROL])
+        self.assertTrue(self.device.awake)
+
+    def test_unconfirmed_rf433(self):
+        self.allone.ignore.add(CONTROL)
+        self.assertFalse(self.device._learn_emit_rf433(True, KEY))
+        self.assertEqual(self.allone.received, [SUBSCRIBE, BLAST_IR, CONTROL, SUBSCRIBE, BLAST_IR, CONTROL])
+
+    def test_failed_wake_up(self):
+        self.allone.awake = False
+        self.allone.ignore.add(BLAST_IR)
+        self.assertFalse(self.device._learn_emit_rf433(True, KEY))
+        self.assertEqual(self.allone.received, [SUBSCRIBE, BLAST_IR])
+        self.assertFalse(self.device.awake)
+
+    def test_unconfirmed_ir_emit(self):
+        self.allone.ignore.add(BLAST_IR)
+        self.device.emit_ir(b'\x00\x00')
+        self.assertFalse(self.device.awake)
+
+    def test_failed_learn_rf433(self):
+        self.allone.ignore.add(CONTROL)
+        tmp = tempfile.mkdtemp()
+        try:
+            fname = os.path.join(tmp, 'switch.rf')
+            self.assertIsNone(self.device.learn_rf433(fname))
+            self.assertFalse(os.path.exists(fname))
+        finally:
+            shutil.rmtree(tmp)
+
+if __name__ == '__main__':
+    unittest.main()